@@ -3,22 +3,29 @@ This is the main entry point for the agent.
 It defines the workflow graph, state, tools, nodes and edges.
 """
 
-import json
 import os
 import asyncio
+import functools
+import logging
 from typing import Dict, List, Any, Optional
-from typing_extensions import Literal
+from typing_extensions import Annotated, Literal
+import asyncpg
+import orjson
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, AIMessage
+from langchain_core.messages import SystemMessage, AIMessage, HumanMessage, ToolMessage, BaseMessage
 from langchain_core.runnables import RunnableConfig
 from langchain.tools import tool
 from langgraph.graph import StateGraph, END
 from langgraph.types import Command
-from langgraph.prebuilt import ToolNode
+from langgraph.prebuilt import InjectedState, ToolNode
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.constants import Send
 from copilotkit import CopilotKitState
+from copilotkit.langgraph import copilotkit_emit_state
 from .perplexity_client import CompanyResearchClient
+from .llm_cache import LLMResponseCache
+
+logger = logging.getLogger(__name__)
 
 class AgentState(CopilotKitState):
     """
@@ -38,6 +45,108 @@ class AgentState(CopilotKitState):
 # Initialize company research client (OpenAI-powered)
 research_client = CompanyResearchClient()
 
+def dump_tool_result(result: Any) -> str:
+    """Serialize a tool result as compact JSON to keep the model's input short."""
+    return orjson.dumps(result).decode()
+
+# Mock rows matching the database schema, used when no database is configured
+MOCK_COMPANIES = [
+    {
+        "id": 1,
+        "name": "Apple Inc.",
+        "ticker_symbol": "AAPL",
+        "industry": "Consumer Electronics",
+        "sector": "Technology",
+        "market_cap": 3000000000000,
+        "employees": 164000,
+        "founded_year": 1976,
+        "headquarters": "Cupertino, CA",
+        "website": "https://www.apple.com",
+        "description": "Apple Inc. is an American multinational technology company specializing in consumer electronics, software, and online services."
+    },
+    {
+        "id": 2,
+        "name": "Microsoft Corporation",
+        "ticker_symbol": "MSFT",
+        "industry": "Software",
+        "sector": "Technology",
+        "market_cap": 2800000000000,
+        "employees": 221000,
+        "founded_year": 1975,
+        "headquarters": "Redmond, WA",
+        "website": "https://www.microsoft.com",
+        "description": "Microsoft Corporation is an American multinational technology corporation."
+    },
+    {
+        "id": 3,
+        "name": "Tesla Inc.",
+        "ticker_symbol": "TSLA",
+        "industry": "Electric Vehicles",
+        "sector": "Consumer Discretionary",
+        "market_cap": 800000000000,
+        "employees": 140000,
+        "founded_year": 2003,
+        "headquarters": "Austin, TX",
+        "website": "https://www.tesla.com",
+        "description": "Tesla, Inc. is an American electric vehicle and clean energy company."
+    }
+]
+
+# (lowercased name, uppercased ticker, row) for each mock company, built once
+MOCK_COMPANY_INDEX = [
+    (company["name"].lower(), company["ticker_symbol"].upper(), company)
+    for company in MOCK_COMPANIES
+]
+
+SEARCH_COMPANIES_SQL = """
+    SELECT id, name, ticker_symbol, industry, sector, market_cap,
+           employees, founded_year, headquarters, website, description
+    FROM companies
+    WHERE name ILIKE $1 OR ticker_symbol = $2
+    ORDER BY market_cap DESC NULLS LAST
+    LIMIT $3
+"""
+
+# Shared PostgreSQL pool, created on first use. Only when DATABASE_URL is not
+# set does search_companies_db fall back to the mock data; a configured but
+# unreachable database is reported as an error and retried on the next call.
+db_pool: Optional[asyncpg.Pool] = None
+db_pool_lock = asyncio.Lock()
+
+async def get_db_pool() -> Optional[asyncpg.Pool]:
+    """
+    Return the shared database pool, or None if no database is configured.
+    Raises if DATABASE_URL is set but the pool cannot be created.
+    """
+    global db_pool
+    if db_pool is not None:
+        return db_pool
+
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        return None
+
+    async with db_pool_lock:
+        if db_pool is None:
+            try:
+                db_pool = await asyncpg.create_pool(database_url, min_size=2, max_size=10)
+            except Exception as e:
+                logger.error("Failed to connect to database: %s", e)
+                raise
+    return db_pool
+
+def search_mock_companies(query: str, limit: int) -> List[Dict[str, Any]]:
+    """Filter the mock companies by name or ticker symbol."""
+    query_lower = query.lower()
+    query_upper = query.upper()
+    results = []
+    for name_lower, ticker_upper, company in MOCK_COMPANY_INDEX:
+        if len(results) >= limit:
+            break
+        if query_lower in name_lower or query_upper in ticker_upper:
+            results.append(company)
+    return results
+
 @tool
 async def search_companies_db(query: str, limit: int = 10) -> str:
     """
@@ -51,67 +160,42 @@ async def search_companies_db(query: str, limit: int = 10) -> str:
         JSON string with company information from database
     """
     try:
-        print(f"🔍 Searching companies database for: {query}")
-        # In a real implementation, you'd connect to your MCP server here
-        # For now, we'll return mock data that matches our database schema
-        mock_results = [
-            {
-                "id": 1,
-                "name": "Apple Inc.",
-                "ticker_symbol": "AAPL",
-                "industry": "Consumer Electronics",
-                "sector": "Technology",
-                "market_cap": 3000000000000,
-                "employees": 164000,
-                "founded_year": 1976,
-                "headquarters": "Cupertino, CA",
-                "website": "https://www.apple.com",
-                "description": "Apple Inc. is an American multinational technology company specializing in consumer electronics, software, and online services."
-            },
-            {
-                "id": 2,
-                "name": "Microsoft Corporation",
-                "ticker_symbol": "MSFT",
-                "industry": "Software",
-                "sector": "Technology",
-                "market_cap": 2800000000000,
-                "employees": 221000,
-                "founded_year": 1975,
-                "headquarters": "Redmond, WA",
-                "website": "https://www.microsoft.com",
-                "description": "Microsoft Corporation is an American multinational technology corporation."
-            },
-            {
-                "id": 3,
-                "name": "Tesla Inc.",
-                "ticker_symbol": "TSLA",
-                "industry": "Electric Vehicles",
-                "sector": "Consumer Discretionary",
-                "market_cap": 800000000000,
-                "employees": 140000,
-                "founded_year": 2003,
-                "headquarters": "Austin, TX",
-                "website": "https://www.tesla.com",
-                "description": "Tesla, Inc. is an American electric vehicle and clean energy company."
-            }
-        ]
-        
-        # Filter results based on query
-        filtered_results = [
-            result for result in mock_results 
-            if query.lower() in result["name"].lower() or 
-               query.upper() in result["ticker_symbol"]
-        ]
+        logger.debug("🔍 Searching companies database for: %s", query)
+        pool = await get_db_pool()
+        if pool is not None:
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(SEARCH_COMPANIES_SQL, f"%{query}%", query.upper(), limit)
+            filtered_results = [dict(row) for row in rows]
+        else:
+            filtered_results = search_mock_companies(query, limit)
         
-        print(f"📊 Found {len(filtered_results)} companies matching '{query}'")
-        result_json = json.dumps(filtered_results[:limit], indent=2)
-        print(f"📤 Returning data: {result_json}")
-        return result_json
+        logger.debug("📊 Found %d companies matching '%s'", len(filtered_results), query)
+        return dump_tool_result(filtered_results)
     except Exception as e:
-        return json.dumps({"error": f"Database search failed: {str(e)}"}, indent=2)
+        return dump_tool_result({"error": f"Database search failed: {str(e)}"})
+
+def research_streamer(config: Optional[RunnableConfig], state: Optional[Dict[str, Any]], field: str):
+    """
+    Build an on_delta callback that streams partial research text to the
+    frontend by emitting intermediate agent state. Returns None when the tool
+    is not running inside the graph.
+    """
+    if config is None or state is None:
+        return None
+
+    parts = []
+
+    async def on_delta(delta: str):
+        parts.append(delta)
+        research_data = {**(state.get("research_data") or {}), field: "".join(parts)}
+        await copilotkit_emit_state(config, {**state, "research_data": research_data, "is_researching": True})
+
+    return on_delta
 
 @tool
-async def search_company_openai(company_name: str, specific_info: str = None) -> str:
+async def search_company_openai(company_name: str, specific_info: str = None,
+                                config: RunnableConfig = None,
+                                state: Annotated[dict, InjectedState] = None) -> str:
     """
     Search for company information using OpenAI.
     
@@ -123,10 +207,14 @@ async def search_company_openai(company_name: str, specific_info: str = None) ->
         JSON string with company information from OpenAI
     """
     try:
-        result = await research_client.search_company_info(company_name, specific_info)
-        return json.dumps(result, indent=2)
+        result = await research_client.search_company_info(
+            company_name,
+            specific_info,
+            on_delta=research_streamer(config, state, "analysis")
+        )
+        return dump_tool_result(result)
     except Exception as e:
-        return json.dumps({"error": f"OpenAI search failed: {str(e)}"}, indent=2)
+        return dump_tool_result({"error": f"OpenAI search failed: {str(e)}"})
 
 @tool
 async def get_company_news(company_name: str, days: int = 7) -> str:
@@ -142,9 +230,9 @@ async def get_company_news(company_name: str, days: int = 7) -> str:
     """
     try:
         result = await research_client.get_company_news(company_name, days)
-        return json.dumps(result, indent=2)
+        return dump_tool_result(result)
     except Exception as e:
-        return json.dumps({"error": f"News search failed: {str(e)}"}, indent=2)
+        return dump_tool_result({"error": f"News search failed: {str(e)}"})
 
 @tool
 async def get_company_financials(company_name: str) -> str:
@@ -159,12 +247,33 @@ async def get_company_financials(company_name: str) -> str:
     """
     try:
         result = await research_client.get_company_financials(company_name)
-        return json.dumps(result, indent=2)
+        return dump_tool_result(result)
     except Exception as e:
-        return json.dumps({"error": f"Financial search failed: {str(e)}"}, indent=2)
+        return dump_tool_result({"error": f"Financial search failed: {str(e)}"})
 
 @tool
-async def compare_companies(company1: str, company2: str) -> str:
+async def research_company_bundle(company_name: str, days: int = 7) -> str:
+    """
+    Get business analysis, recent news and financial information about a company
+    in a single call. The three OpenAI requests run concurrently.
+    
+    Args:
+        company_name: Name of the company
+        days: Number of days to look back for news (default: 7)
+    
+    Returns:
+        JSON string with "analysis", "news" and "financials" results
+    """
+    try:
+        result = await research_client.research_company_bundle(company_name, days)
+        return dump_tool_result(result)
+    except Exception as e:
+        return dump_tool_result({"error": f"Research bundle failed: {str(e)}"})
+
+@tool
+async def compare_companies(company1: str, company2: str,
+                            config: RunnableConfig = None,
+                            state: Annotated[dict, InjectedState] = None) -> str:
     """
     Compare two companies using OpenAI.
     
@@ -176,19 +285,176 @@ async def compare_companies(company1: str, company2: str) -> str:
         JSON string with comparison results
     """
     try:
-        result = await research_client.compare_companies(company1, company2)
-        return json.dumps(result, indent=2)
+        result = await research_client.compare_companies(
+            company1,
+            company2,
+            on_delta=research_streamer(config, state, "comparison")
+        )
+        return dump_tool_result(result)
     except Exception as e:
-        return json.dumps({"error": f"Comparison failed: {str(e)}"}, indent=2)
+        return dump_tool_result({"error": f"Comparison failed: {str(e)}"})
 
 tools = [
     search_companies_db,
     search_company_openai,
     get_company_news,
     get_company_financials,
+    research_company_bundle,
     compare_companies
 ]
 
+# 1. Define the model once; its HTTP client and connection pool are reused across turns.
+#    The planner only picks tools, so a small model is enough; the research
+#    tools keep using gpt-4o for the content itself.
+PLANNER_MODEL = os.getenv("PLANNER_MODEL", "gpt-4o-mini")
+model = ChatOpenAI(model=PLANNER_MODEL)
+
+@functools.lru_cache(maxsize=32)
+def bind_model_tools(actions_json: bytes):
+    """
+    Bind the CopilotKit actions (serialized as JSON, which makes them
+    hashable) and the tools defined above to the model, once per action set.
+    """
+    return model.bind_tools(
+        [
+            *orjson.loads(actions_json),
+            *tools
+        ],
+
+        # 2.1 Enable parallel tool calls so the independent research tools
+        #     can be emitted in one batch. ToolNode runs the async tools of a
+        #     single message concurrently. The system prompt keeps frontend
+        #     actions out of those batches; chat_node defers any that slip in.
+        parallel_tool_calls=True,
+    )
+
+SYSTEM_PROMPT = """You are a company research assistant with a PostgreSQL company database \
+(search_companies_db), OpenAI research tools, and frontend actions that display results.
+
+For every company question:
+1. Call search_companies_db first.
+2. Show the results: displayCompanyInfo with the first company, plus updateCompanyList if there are several. \
+Pass the parsed company objects, never the raw JSON string.
+3. Call startResearch with the company name.
+4. In ONE batch, call search_company_openai, get_company_news and get_company_financials \
+(or research_company_bundle alone).
+5. Call updateResearchBundle once with the analysis, news and financials; this ends research.
+6. Answer by combining the database and research results.
+
+Never mix frontend actions and research tools in one batch. If a tool fails, try the next one; \
+always use both the database and the research tools."""
+
+WORKFLOW_EXAMPLE = """Example for "Show me Apple": search_companies_db(query="Apple") -> \
+displayCompanyInfo(company=<Apple object>) -> startResearch(company_name="Apple Inc.") -> \
+[search_company_openai, get_company_news, get_company_financials](company_name="Apple Inc.") -> \
+updateResearchBundle(analysis, news, financials) -> final answer."""
+
+# Human-readable descriptions of backend tool calls, used when asking for approval
+TOOL_DESCRIPTION_FORMATTERS = {
+    "search_companies_db": lambda args: f"Search database for companies matching: '{args.get('query', '')}'",
+    "search_company_openai": lambda args: f"Get AI analysis for company: '{args.get('company_name', '')}'",
+    "get_company_news": lambda args: f"Get recent news for company: '{args.get('company_name', '')}'",
+    "get_company_financials": lambda args: f"Get financial data for company: '{args.get('company_name', '')}'",
+    "research_company_bundle": lambda args: f"Get AI analysis, news and financials for company: '{args.get('company_name', '')}'",
+    "compare_companies": lambda args: f"Compare companies: '{args.get('company1', '')}' vs '{args.get('company2', '')}'",
+}
+
+def describe_tool_call(tool_call: Dict[str, Any]) -> Dict[str, Any]:
+    """Describe a tool call for the human approval prompt."""
+    tool_name = tool_call.get("name")
+    tool_args = tool_call.get("args", {})
+    formatter = TOOL_DESCRIPTION_FORMATTERS.get(tool_name)
+    description = formatter(tool_args) if formatter else f"Execute {tool_name} with args: {tool_args}"
+    return {"name": tool_name, "description": description, "args": tool_args}
+
+# Number of most recent messages sent to the model, besides the first one
+MESSAGE_WINDOW = int(os.getenv("MESSAGE_WINDOW", "8"))
+
+def window_messages(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """
+    Keep the first message (the original question) and the last MESSAGE_WINDOW
+    messages, dropping the middle of long conversations. If the window would
+    start on a ToolMessage it is widened back to the AIMessage that issued the
+    tool calls, so a call/result group is never split, even when a parallel
+    batch has more results than MESSAGE_WINDOW.
+    """
+    if len(messages) <= MESSAGE_WINDOW + 1:
+        return messages
+
+    start = len(messages) - MESSAGE_WINDOW
+    while start > 1 and isinstance(messages[start], ToolMessage):
+        start -= 1
+    if start <= 1:
+        return messages
+    return [messages[0], *messages[start:]]
+
+# Thanks that end the conversation and don't need a model call. Words like
+# "ok" are left out: after a question they are an answer, not a thank-you.
+ACKNOWLEDGEMENTS = {"thanks", "thank you", "thanks a lot", "thank you so much", "ty", "thx", "cheers"}
+
+# Cache of final chat_node answers, keyed on the conversation so far.
+# Set NODE_CACHE_ENABLED=false to always call the model. Answers can depend
+# on the date ("today's stock price"), so they expire like cached news does.
+NODE_CACHE_ENABLED = os.getenv("NODE_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+NODE_CACHE_TTL_SECONDS = float(os.getenv("NODE_CACHE_TTL_SECONDS", str(60 * 60)))
+node_cache = LLMResponseCache(
+    maxsize=int(os.getenv("NODE_CACHE_SIZE", "256")),
+    path=os.getenv("NODE_CACHE_PATH")
+)
+
+def message_fingerprint(message: BaseMessage) -> List[Any]:
+    """
+    The parts of a message that shape the next answer. Tool-calling turns
+    often have empty content, so the tool calls and the call a tool result
+    belongs to are included as well.
+    """
+    return [
+        message.type,
+        message.content,
+        [[tc["name"], tc["args"]] for tc in getattr(message, "tool_calls", None) or []],
+        getattr(message, "tool_call_id", None),
+    ]
+
+def chat_cache_key(state: AgentState) -> str:
+    """Fingerprint the conversation and language that chat_node answers."""
+    return node_cache.make_key(
+        messages=[message_fingerprint(message) for message in state.get("messages", [])],
+        language=state.get("language", "english")
+    )
+
+def cached_node(key_fn):
+    """
+    Replay a node's final answer for inputs it has already answered.
+
+    Only responses without tool calls are cached, so tool execution and
+    frontend actions are never skipped.
+    """
+    def decorator(node):
+        @functools.wraps(node)
+        async def wrapper(state: AgentState, config: RunnableConfig):
+            if not NODE_CACHE_ENABLED:
+                return await node(state, config)
+
+            key = key_fn(state)
+            content = await node_cache.get(key)
+            if content is not None:
+                return Command(goto=END, update={"messages": AIMessage(content=content)})
+
+            command = await node(state, config)
+            response = (command.update or {}).get("messages")
+            if (
+                command.goto == END
+                and isinstance(response, AIMessage)
+                and not response.tool_calls
+                and isinstance(response.content, str)
+                and response.content
+            ):
+                await node_cache.set(key, response.content, NODE_CACHE_TTL_SECONDS)
+            return command
+        return wrapper
+    return decorator
+
+@cached_node(key_fn=chat_cache_key)
 async def chat_node(state: AgentState, config: RunnableConfig) -> Command[Literal["tool_node", "__end__"]]:
     """
     Standard chat node based on the ReAct design pattern. It handles:
@@ -201,109 +467,80 @@ async def chat_node(state: AgentState, config: RunnableConfig) -> Command[Litera
     https://www.perplexity.ai/search/react-agents-NcXLQhreS0WDzpVaS4m9Cg
     """
     
-    print("🤖 Chat node called with state keys:", list(state.keys()))
-    print("🤖 Messages count:", len(state.get("messages", [])))
-    print("🤖 Available actions:", [action.get("name") for action in state.get("copilotkit", {}).get("actions", [])])
-    if state.get("messages"):
-        print("🤖 Last message:", state["messages"][-1].content if state["messages"] else "No messages")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🤖 Chat node called with state keys: %s", list(state.keys()))
+        logger.debug("🤖 Messages count: %d", len(state.get("messages", [])))
+        logger.debug("🤖 Available actions: %s", [action.get("name") for action in state.get("copilotkit", {}).get("actions", [])])
+        if state.get("messages"):
+            logger.debug("🤖 Last message: %s", state["messages"][-1].content)
     
-    # 1. Define the model
-    model = ChatOpenAI(model="gpt-4o")
-
-    # 2. Bind the tools to the model
-    model_with_tools = model.bind_tools(
-        [
-            *state["copilotkit"]["actions"],
-            *tools
-        ],
-
-        # 2.1 Disable parallel tool calls to avoid race conditions,
-        #     enable this for faster performance if you want to manage
-        #     the complexity of running tool calls in parallel.
-        parallel_tool_calls=False,
+    # 0. Answer a plain thank-you directly, without calling the model, but
+    #    only when it follows a final answer rather than a question or a
+    #    pending tool call. The canned reply is English, so other languages
+    #    still go to the model.
+    messages = state.get("messages", [])
+    last_message = messages[-1] if messages else None
+    previous_message = messages[-2] if len(messages) > 1 else None
+    if (
+        state.get("language", "english").lower() == "english"
+        and isinstance(last_message, HumanMessage)
+        and isinstance(last_message.content, str)
+        and last_message.content.strip().lower().rstrip("!.") in ACKNOWLEDGEMENTS
+        and isinstance(previous_message, AIMessage)
+        and not previous_message.tool_calls
+        and isinstance(previous_message.content, str)
+        and not previous_message.content.rstrip().endswith("?")
+    ):
+        return Command(goto=END, update={"messages": AIMessage(content="You're welcome!")})
+    
+    # 1. & 2. Get the shared model with the CopilotKit actions and tools bound.
+    #    CopilotKit actions are sorted by name so the tool schemas are
+    #    serialized identically on every turn (and hit the bind cache).
+    actions_json = orjson.dumps(
+        sorted(state["copilotkit"]["actions"], key=lambda action: action["name"]),
+        option=orjson.OPT_SORT_KEYS
     )
+    model_with_tools = bind_model_tools(actions_json)
 
-    # 3. Define the system message by which the chat model will be run
-    system_message = SystemMessage(
-        content=f"""You are a helpful company research assistant. You have access to:
-        
-        1. A PostgreSQL database with company information (use search_companies_db tool)
-        2. OpenAI-powered research tools for comprehensive company analysis
-        3. Frontend actions to display company information and stream research results
-        
-        WORKFLOW - When users ask about companies, follow this exact order:
-        
-        1. ALWAYS start by calling search_companies_db tool to get basic company info
-        2. If search_companies_db returns company data:
-           - Call displayCompanyInfo with the first company found
-           - If multiple companies found, also call updateCompanyList
-        3. Call startResearch with the company name to indicate research is beginning
-        4. THEN stream OpenAI research results in sequence:
-           - Call search_company_openai for detailed business analysis
-           - Call updateResearchAnalysis with the analysis content
-           - Call get_company_news for recent news and developments
-           - Call updateResearchNews with the news content
-           - Call get_company_financials for financial performance
-           - Call updateResearchFinancials with the financial content (this also ends research)
-        5. Provide a comprehensive response combining both database and OpenAI research
-        
-        CRITICAL RULES:
-        - ALWAYS call search_companies_db FIRST for any company query
-        - ALWAYS call displayCompanyInfo or updateCompanyList with the database results
-        - ALWAYS call startResearch before beginning OpenAI research
-        - ALWAYS stream research results using updateResearchAnalysis, updateResearchNews, updateResearchFinancials
-        - Call updateResearchFinancials LAST to end the research state
-        - If a tool returns an error, try the next available tool
-        - Never give up without trying both database and OpenAI research
-        
-        Example for "Show me Apple":
-        1. Call search_companies_db with query="Apple"
-        2. Parse the JSON result and call displayCompanyInfo with the company object (NOT the JSON string)
-        3. Call startResearch with company_name="Apple Inc."
-        4. Call search_company_openai with company_name="Apple Inc." for detailed analysis
-        5. Call updateResearchAnalysis with the analysis content
-        6. Call get_company_news with company_name="Apple Inc." for recent news
-        7. Call updateResearchNews with the news content
-        8. Call get_company_financials with company_name="Apple Inc." for financial data
-        9. Call updateResearchFinancials with the financial content
-        10. Provide comprehensive response combining all sources
-        
-        IMPORTANT: When calling displayCompanyInfo or updateCompanyList, pass the actual company object(s), NOT the JSON string from the database tool.
-        
-        CRITICAL JSON HANDLING:
-        - When search_companies_db returns a JSON string, you MUST parse it first before calling frontend actions
-        - Extract individual company objects from the parsed JSON array
-        - Pass these objects directly to displayCompanyInfo/updateCompanyList
-        - DO NOT pass the raw JSON string to frontend actions
-        
-        MANDATORY: For every company query, you MUST call BOTH database AND OpenAI tools.
-        Database gives basic info, OpenAI provides comprehensive analysis, news, and financials.
-        STREAMING: Always use the streaming frontend actions to display research results as they come in.
-        
-        Talk in {state.get('language', 'english')}."""
+    # 3. Define the system messages by which the chat model will be run. The
+    #    worked example is needed on every ReAct step of a turn, and as part
+    #    of the unchanging prefix it is served from the prompt cache.
+    system_messages = [
+        SystemMessage(content=SYSTEM_PROMPT),
+        SystemMessage(content=WORKFLOW_EXAMPLE),
+    ]
+
+    # 3.1 The language goes in its own trailing message so that the system
+    #     prompt, tool schemas and history form a byte-identical prefix
+    #     across turns, which lets OpenAI's automatic prompt caching apply.
+    language_message = SystemMessage(
+        content=f"Talk in {state.get('language', 'english')}."
     )
 
     # 4. Run the model to generate a response
     response = await model_with_tools.ainvoke([
-        system_message,
-        *state["messages"],
+        *system_messages,
+        *window_messages(state["messages"]),
+        language_message,
     ], config)
     
-    print("🤖 Model response type:", type(response))
-    print("🤖 Model response has tool_calls:", hasattr(response, 'tool_calls') and bool(response.tool_calls))
-    if hasattr(response, 'tool_calls') and response.tool_calls:
-        print("🤖 Tool calls:", [tc.get("name") for tc in response.tool_calls])
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🤖 Model response type: %s", type(response))
+        logger.debug("🤖 Model response has tool_calls: %s", hasattr(response, 'tool_calls') and bool(response.tool_calls))
+        if hasattr(response, 'tool_calls') and response.tool_calls:
+            logger.debug("🤖 Tool calls: %s", [tc.get("name") for tc in response.tool_calls])
 
     # 5. Check for tool calls in the response and handle them. We ignore
     #    CopilotKit actions, as they are handled by CopilotKit.
     if isinstance(response, AIMessage) and response.tool_calls:
         actions = state["copilotkit"]["actions"]
         
-        # Debug: Print what action is being called and with what arguments
-        for tool_call in response.tool_calls:
-            if tool_call.get("name") in ["displayCompanyInfo", "updateCompanyList", "startResearch", "updateResearchAnalysis", "updateResearchNews", "updateResearchFinancials"]:
-                print(f"🎯 Agent calling frontend action: {tool_call.get('name')}")
-                print(f"🎯 With arguments: {tool_call.get('args', {})}")
+        # Debug: Log what action is being called and with what arguments
+        if logger.isEnabledFor(logging.DEBUG):
+            for tool_call in response.tool_calls:
+                if tool_call.get("name") in ["displayCompanyInfo", "updateCompanyList", "startResearch", "updateResearchAnalysis", "updateResearchNews", "updateResearchFinancials", "updateResearchBundle"]:
+                    logger.debug("🎯 Agent calling frontend action: %s", tool_call.get('name'))
+                    logger.debug("🎯 With arguments: %s", tool_call.get('args', {}))
 
         # 5.1 Check for any non-copilotkit actions in the response and
         #     request human approval before executing them.
@@ -313,54 +550,19 @@ async def chat_node(state: AgentState, config: RunnableConfig) -> Command[Litera
         ]
         
         if non_copilotkit_calls:
-            # Create human-readable descriptions for approval
-            tool_descriptions = []
-            for tool_call in non_copilotkit_calls:
-                tool_name = tool_call.get('name')
-                tool_args = tool_call.get('args', {})
-                
-                if tool_name == 'search_companies_db':
-                    tool_descriptions.append({
-                        "name": tool_name,
-                        "description": f"Search database for companies matching: '{tool_args.get('query', '')}'",
-                        "args": tool_args
-                    })
-                elif tool_name == 'search_company_openai':
-                    tool_descriptions.append({
-                        "name": tool_name,
-                        "description": f"Get AI analysis for company: '{tool_args.get('company_name', '')}'",
-                        "args": tool_args
-                    })
-                elif tool_name == 'get_company_news':
-                    tool_descriptions.append({
-                        "name": tool_name,
-                        "description": f"Get recent news for company: '{tool_args.get('company_name', '')}'",
-                        "args": tool_args
-                    })
-                elif tool_name == 'get_company_financials':
-                    tool_descriptions.append({
-                        "name": tool_name,
-                        "description": f"Get financial data for company: '{tool_args.get('company_name', '')}'",
-                        "args": tool_args
-                    })
-                elif tool_name == 'compare_companies':
-                    tool_descriptions.append({
-                        "name": tool_name,
-                        "description": f"Compare companies: '{tool_args.get('company1', '')}' vs '{tool_args.get('company2', '')}'",
-                        "args": tool_args
-                    })
-                else:
-                    tool_descriptions.append({
-                        "name": tool_name,
-                        "description": f"Execute {tool_name} with args: {tool_args}",
-                        "args": tool_args
-                    })
-            
             # For now, disable human-in-the-loop to avoid OpenAI API conflicts
             # Log what would be requested for approval
-            print(f"🚨 Would request approval for: {[desc['description'] for desc in tool_descriptions]}")
-            print("🚨 Proceeding with execution (human-in-the-loop temporarily disabled)")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("🚨 Would request approval for: %s", [describe_tool_call(tc)["description"] for tc in non_copilotkit_calls])
+                logger.debug("🚨 Proceeding with execution (human-in-the-loop temporarily disabled)")
             
+            # 5.2 ToolNode cannot run CopilotKit actions, so a batch that mixes
+            #     them with backend tools only keeps the backend calls. The model
+            #     issues the deferred actions again once it has the tool results.
+            if len(non_copilotkit_calls) < len(response.tool_calls):
+                logger.debug("🚨 Deferring frontend actions mixed with backend tools")
+                response = response.model_copy(update={"tool_calls": non_copilotkit_calls})
+
             # Just proceed with tool execution for now
             return Command(goto="tool_node", update={"messages": response})
 
@@ -372,74 +574,25 @@ async def chat_node(state: AgentState, config: RunnableConfig) -> Command[Litera
         }
     )
 
-# Disabled - using simplified approval approach
-# async def human_approval_node(state: AgentState, config: RunnableConfig) -> AgentState:
-    """
-    Human approval node that asks for confirmation before executing tools.
-    """
-    print("👤 Human approval node called")
-    print(f"👤 Pending tool calls: {[tc.get('name') for tc in state.get('pending_tool_calls', [])]}")
-    
-    if not state.get('pending_tool_calls'):
-        print("👤 No pending tool calls, ending")
-        return {**state, "awaiting_approval": False}
-    
-    # Create a human-readable description of the tools to be executed
-    tool_descriptions = []
-    for tool_call in state.get('pending_tool_calls', []):
-        tool_name = tool_call.get('name')
-        tool_args = tool_call.get('args', {})
-        
-        if tool_name == 'search_companies_db':
-            tool_descriptions.append(f"Search database for companies matching: '{tool_args.get('query', '')}'")
-        elif tool_name == 'search_company_openai':
-            tool_descriptions.append(f"Get AI analysis for company: '{tool_args.get('company_name', '')}'")
-        elif tool_name == 'get_company_news':
-            tool_descriptions.append(f"Get recent news for company: '{tool_args.get('company_name', '')}'")
-        elif tool_name == 'get_company_financials':
-            tool_descriptions.append(f"Get financial data for company: '{tool_args.get('company_name', '')}'")
-        elif tool_name == 'compare_companies':
-            tool_descriptions.append(f"Compare companies: '{tool_args.get('company1', '')}' vs '{tool_args.get('company2', '')}'")
-        else:
-            tool_descriptions.append(f"Execute {tool_name} with args: {tool_args}")
-    
-    # Create approval message
-    approval_message = f"""🤖 I need your approval to execute the following tools:
-
-{chr(10).join(f'• {desc}' for desc in tool_descriptions)}
-
-Please respond with:
-- "approve" or "yes" to proceed
-- "deny" or "no" to cancel"""
-    
-    approval_msg = AIMessage(content=approval_message)
-    
-    # Return state with approval message and interrupt for human input
-    return {
-        **state,
-        "messages": state.get("messages", []) + [approval_msg],
-        "awaiting_approval": True
-    }
-
 async def check_approval_node(state: AgentState, config: RunnableConfig) -> Command[Literal["tool_node", "chat_node", "__end__"]]:
     """
     Check the human's approval response.
     """
-    print("✅ Check approval node called")
+    logger.debug("✅ Check approval node called")
     
     if not state.get('messages'):
-        print("✅ No messages, ending")
+        logger.debug("✅ No messages, ending")
         return Command(goto=END, update={"awaiting_approval": False})
     
     # Get the last human message (should be the response to our approval request)
     last_message = state['messages'][-1]
     if hasattr(last_message, 'content'):
         response_content = last_message.content.lower().strip()
-        print(f"✅ Human response: '{response_content}'")
+        logger.debug("✅ Human response: '%s'", response_content)
         
         # Check approval
         if any(word in response_content for word in ['approve', 'yes', 'proceed', 'ok', 'continue']):
-            print("✅ Human approved, proceeding to tool execution")
+            logger.debug("✅ Human approved, proceeding to tool execution")
             # Create a new AIMessage with the original tool calls
             tool_message = AIMessage(content="Executing approved tools...", tool_calls=state.get('pending_tool_calls', []))
             return Command(
@@ -451,7 +604,7 @@ async def check_approval_node(state: AgentState, config: RunnableConfig) -> Comm
                 }
             )
         elif any(word in response_content for word in ['deny', 'no', 'cancel', 'stop']):
-            print("❌ Human denied, cancelling tool execution")
+            logger.debug("❌ Human denied, cancelling tool execution")
             cancel_message = AIMessage(content="Tool execution cancelled as per your request. How else can I help you?")
             return Command(
                 goto=END,
@@ -462,7 +615,7 @@ async def check_approval_node(state: AgentState, config: RunnableConfig) -> Comm
                 }
             )
         else:
-            print("❓ Unclear response, asking for clarification")
+            logger.debug("❓ Unclear response, asking for clarification")
             clarification_message = AIMessage(content="I didn't understand your response. Please reply with 'approve' to proceed or 'deny' to cancel.")
             return Command(
                 goto="chat_node",
@@ -472,7 +625,7 @@ async def check_approval_node(state: AgentState, config: RunnableConfig) -> Comm
                 }
             )
     
-    print("❓ No valid message content, ending")
+    logger.debug("❓ No valid message content, ending")
     return Command(goto=END, update={"awaiting_approval": False})
 
 # Define the workflow graph
@@ -4,9 +4,13 @@ through our FastAPI integration. However, you can also host in LangGraph platfor
 """
 
 import os
+import logging
 from dotenv import load_dotenv
 load_dotenv() # pylint: disable=wrong-import-position
 
+# Agent debug logging is off unless LOG_LEVEL=DEBUG
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+
 from fastapi import FastAPI
 import uvicorn
 from copilotkit.integrations.fastapi import add_fastapi_endpoint
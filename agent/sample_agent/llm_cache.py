@@ -0,0 +1,96 @@
+"""
+Response cache for OpenAI chat completions.
+"""
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+import orjson
+
+logger = logging.getLogger(__name__)
+
+class LLMResponseCache:
+    """
+    LRU cache of completion contents keyed by a hash of the request.
+
+    Entries live in memory and, when a SQLite path is given, are also written
+    to disk so they survive restarts. Each entry can carry its own TTL;
+    entries stored without one never expire.
+    """
+
+    def __init__(self, maxsize: int = 1024, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.path = path
+        self._entries: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache "
+                "(key TEXT PRIMARY KEY, content TEXT NOT NULL, expires_at REAL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(**request: Any) -> str:
+        """Build a stable cache key from the request parameters."""
+        payload = orjson.dumps(request, option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(payload).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return the cached content for key, or None on a miss."""
+        entry = self._entries.get(key)
+        if entry is None and self._db is not None:
+            entry = await asyncio.to_thread(self._load, key)
+            if entry is not None:
+                self._remember(key, entry)
+
+        if entry is None:
+            return None
+
+        content, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            self._entries.pop(key, None)
+            return None
+
+        self._entries.move_to_end(key)
+        return content
+
+    async def set(self, key: str, content: str, ttl: Optional[float] = None):
+        """Store content under key, expiring after ttl seconds if given."""
+        expires_at = time.time() + ttl if ttl is not None else None
+        self._remember(key, (content, expires_at))
+        if self._db is not None:
+            await asyncio.to_thread(self._store, key, content, expires_at)
+
+    def _remember(self, key: str, entry: Tuple[str, Optional[float]]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        # A locked or unreadable cache file is treated as a miss
+        try:
+            row = self._db.execute(
+                "SELECT content, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read LLM cache entry: {e}")
+            return None
+        return (row[0], row[1]) if row else None
+
+    def _store(self, key: str, content: str, expires_at: Optional[float]):
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, content, expires_at) VALUES (?, ?, ?)",
+                (key, content, expires_at)
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to persist LLM cache entry: {e}")
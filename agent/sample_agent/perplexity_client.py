@@ -3,28 +3,152 @@ OpenAI client for company information search and analysis.
 """
 
 import os
+import importlib.util
 import asyncio
-import json
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Any
 import logging
-from openai import AsyncOpenAI
+import orjson
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from .llm_cache import LLMResponseCache
 
 logger = logging.getLogger(__name__)
 
+# Upper bound for a single research request when fanned out in a bundle
+RESEARCH_TIMEOUT_SECONDS = float(os.getenv("RESEARCH_TIMEOUT_SECONDS", "60"))
+
+# News goes stale, so its cached responses expire; everything else is kept
+NEWS_CACHE_TTL_SECONDS = float(os.getenv("NEWS_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+
+# Streamed deltas are grouped before being handed on: the first batch is small
+# so text shows up quickly, later batches grow to cut per-update overhead
+DEFAULT_STREAM_BATCH_CHARS = 64
+MAX_STREAM_BATCH_CHARS = 1024
+STREAM_BATCH_GROWTH_FACTOR = 2
+
 class CompanyResearchClient:
     """Client for OpenAI-powered company research."""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, cache: Optional[LLMResponseCache] = None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        self.client = AsyncOpenAI(api_key=self.api_key)
+        # HTTP/2 lets concurrent research requests share one multiplexed connection;
+        # httpx only supports it when the optional h2 package is installed
+        self.client = AsyncOpenAI(
+            api_key=self.api_key,
+            http_client=DefaultAsyncHttpxClient(
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+            )
+        )
+        self._inflight: Dict[str, "asyncio.Future[str]"] = {}
+        self.cache = cache or LLMResponseCache(
+            maxsize=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+            path=os.getenv("LLM_CACHE_PATH")
+        )
+    
+    async def _stream_chat(self, model: str, messages: List[Dict[str, str]], max_tokens: int,
+                           temperature: float, ttl: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Stream a chat completion in batches of text, reusing the cached content
+        for identical requests. The full content is cached once the stream ends.
+        """
+        key = self.cache.make_key(
+            model=model, messages=messages, max_tokens=max_tokens, temperature=temperature
+        )
+        content = await self.cache.get(key)
+        if content is not None:
+            yield content
+            return
+        
+        # Identical requests already in flight share that request's result
+        while key in self._inflight:
+            content = await self._wait_inflight(self._inflight[key])
+            if content is not None:
+                yield content
+                return
+        
+        inflight = asyncio.get_running_loop().create_future()
+        self._inflight[key] = inflight
+        try:
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True
+            )
+            
+            parts = []
+            batch = []
+            batch_chars = 0
+            batch_limit = DEFAULT_STREAM_BATCH_CHARS
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                parts.append(delta)
+                batch.append(delta)
+                batch_chars += len(delta)
+                if batch_chars >= batch_limit:
+                    yield "".join(batch)
+                    batch = []
+                    batch_chars = 0
+                    batch_limit = min(batch_limit * STREAM_BATCH_GROWTH_FACTOR, MAX_STREAM_BATCH_CHARS)
+            if batch:
+                yield "".join(batch)
+            
+            content = "".join(parts)
+            if content:
+                await self.cache.set(key, content, ttl)
+            inflight.set_result(content)
+        except Exception as e:
+            inflight.set_exception(e)
+            # Mark the exception as retrieved in case nobody was waiting
+            inflight.exception()
+            raise
+        finally:
+            # The stream was abandoned; waiters retry with their own request
+            if not inflight.done():
+                inflight.cancel()
+            self._inflight.pop(key, None)
+    
+    @staticmethod
+    async def _wait_inflight(inflight: "asyncio.Future[str]") -> Optional[str]:
+        """
+        Wait for an in-flight request started by another caller. Returns None
+        if that caller abandoned it, so the waiter can make its own request.
+        """
+        try:
+            return await asyncio.shield(inflight)
+        except asyncio.CancelledError:
+            if inflight.cancelled():
+                return None
+            raise
+    
+    async def _cached_chat(self, model: str, messages: List[Dict[str, str]], max_tokens: int,
+                           temperature: float, ttl: Optional[float] = None,
+                           on_delta: Optional[Callable[[str], Awaitable[None]]] = None) -> str:
+        """Collect a streamed chat completion, passing each batch of text to on_delta."""
+        parts = []
+        async for delta in self._stream_chat(model, messages, max_tokens, temperature, ttl):
+            parts.append(delta)
+            if on_delta is not None:
+                await on_delta(delta)
+        return "".join(parts)
     
-    async def search_company_info(self, company_name: str, specific_info: Optional[str] = None) -> Dict[str, Any]:
+    async def search_company_info(self, company_name: str, specific_info: Optional[str] = None,
+                                  cache_ttl: Optional[float] = None,
+                                  on_delta: Optional[Callable[[str], Awaitable[None]]] = None) -> Dict[str, Any]:
         """
         Search for company information using OpenAI.
         
         Args:
             company_name: Name of the company to search for
             specific_info: Specific information to look for (e.g., "recent news", "financial performance")
+            cache_ttl: Seconds to keep the response cached (default: no expiry)
+            on_delta: Optional coroutine called with each batch of streamed text
         
         Returns:
             Dictionary containing the search results
@@ -60,7 +184,7 @@ Please include:
 Format the response as detailed, factual information that would be useful for business research."""
         
         try:
-            response = await self.client.chat.completions.create(
+            content = await self._cached_chat(
                 model="gpt-4o",
                 messages=[
                     {
@@ -73,10 +197,11 @@ Format the response as detailed, factual information that would be useful for bu
                     }
                 ],
                 max_tokens=1500,
-                temperature=0.2
+                temperature=0.2,
+                ttl=cache_ttl,
+                on_delta=on_delta
             )
             
-            content = response.choices[0].message.content
             return self._process_response(content, company_name)
         
         except Exception as e:
@@ -101,7 +226,8 @@ Format the response as detailed, factual information that would be useful for bu
         """Get recent news about a company."""
         return await self.search_company_info(
             company_name,
-            f"recent news and developments in the last {days} days"
+            f"recent news and developments in the last {days} days",
+            cache_ttl=NEWS_CACHE_TTL_SECONDS
         )
     
     async def get_company_financials(self, company_name: str) -> Dict[str, Any]:
@@ -118,7 +244,40 @@ Format the response as detailed, factual information that would be useful for bu
             "business strategy, competitive position, market analysis, and industry trends"
         )
     
-    async def compare_companies(self, company1: str, company2: str) -> Dict[str, Any]:
+    async def research_company_bundle(self, company_name: str, days: int = 7) -> Dict[str, Any]:
+        """
+        Get analysis, news and financials for a company in one call.
+
+        The three requests are independent, so they are issued concurrently and
+        the total latency is that of the slowest one rather than their sum.
+
+        Args:
+            company_name: Name of the company
+            days: Number of days to look back for news (default: 7)
+
+        Returns:
+            Dictionary with "analysis", "news" and "financials" results
+        """
+        results = await asyncio.gather(
+            asyncio.wait_for(self.search_company_info(company_name), RESEARCH_TIMEOUT_SECONDS),
+            asyncio.wait_for(self.get_company_news(company_name, days), RESEARCH_TIMEOUT_SECONDS),
+            asyncio.wait_for(self.get_company_financials(company_name), RESEARCH_TIMEOUT_SECONDS),
+            return_exceptions=True
+        )
+
+        bundle = {}
+        for key, result in zip(("analysis", "news", "financials"), results):
+            if isinstance(result, asyncio.TimeoutError):
+                logger.error(f"OpenAI {key} request for {company_name} timed out")
+                result = {"error": f"Request timed out after {RESEARCH_TIMEOUT_SECONDS:g}s"}
+            elif isinstance(result, Exception):
+                logger.error(f"OpenAI {key} request for {company_name} failed: {result}")
+                result = {"error": f"Request failed: {str(result)}"}
+            bundle[key] = result
+        return bundle
+    
+    async def compare_companies(self, company1: str, company2: str,
+                                on_delta: Optional[Callable[[str], Awaitable[None]]] = None) -> Dict[str, Any]:
         """Compare two companies."""
         prompt = f"""Compare {company1} and {company2} companies in detail.
 
@@ -134,7 +293,7 @@ Please provide a comprehensive comparison including:
 Format the response as a detailed comparative analysis."""
         
         try:
-            response = await self.client.chat.completions.create(
+            content = await self._cached_chat(
                 model="gpt-4o",
                 messages=[
                     {
@@ -147,10 +306,10 @@ Format the response as a detailed comparative analysis."""
                     }
                 ],
                 max_tokens=1500,
-                temperature=0.2
+                temperature=0.2,
+                on_delta=on_delta
             )
             
-            content = response.choices[0].message.content
             return self._process_response(content, f"{company1} vs {company2}")
         
         except Exception as e:
@@ -164,11 +323,11 @@ async def test_perplexity_client():
     
     # Test company search
     result = await client.search_company_info("Apple Inc.")
-    print("Company Info:", json.dumps(result, indent=2))
+    print("Company Info:", orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
     
     # Test news search
     news = await client.get_company_news("Tesla", days=30)
-    print("News:", json.dumps(news, indent=2))
+    print("News:", orjson.dumps(news, option=orjson.OPT_INDENT_2).decode())
 
 if __name__ == "__main__":
     asyncio.run(test_perplexity_client())
\ No newline at end of file
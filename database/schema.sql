@@ -21,6 +21,14 @@ CREATE INDEX IF NOT EXISTS idx_companies_ticker ON companies(ticker_symbol);
 CREATE INDEX IF NOT EXISTS idx_companies_industry ON companies(industry);
 CREATE INDEX IF NOT EXISTS idx_companies_sector ON companies(sector);
 
+-- Trigram indexes so ILIKE '%query%' searches do not scan the whole table
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_companies_name_trgm ON companies USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_companies_ticker_trgm ON companies USING gin (ticker_symbol gin_trgm_ops);
+
+-- Matches ORDER BY market_cap DESC NULLS LAST so top-N queries skip the sort
+CREATE INDEX IF NOT EXISTS idx_companies_market_cap_desc ON companies (market_cap DESC NULLS LAST);
+
 -- Sample data
 INSERT INTO companies (name, ticker_symbol, industry, sector, market_cap, employees, founded_year, headquarters, website, description) VALUES
 ('Apple Inc.', 'AAPL', 'Consumer Electronics', 'Technology', 3000000000000, 164000, 1976, 'Cupertino, CA', 'https://www.apple.com', 'Apple Inc. is an American multinational technology company specializing in consumer electronics, software, and online services.'),
@@ -255,6 +255,29 @@ function YourMainContent() {
     },
   });
 
+  useCopilotAction({
+    name: "updateResearchBundle",
+    parameters: [
+      { name: "analysis", description: "OpenAI company analysis content", required: true },
+      { name: "news", description: "OpenAI company news content", required: true },
+      { name: "financials", description: "OpenAI company financial content", required: true },
+    ],
+    handler: ({ analysis, news, financials }) => {
+      console.log("📦 Received research bundle");
+      const asText = (value: unknown) => typeof value === 'string' ? value : JSON.stringify(value);
+      setState({
+        ...state,
+        research_data: {
+          ...state.research_data,
+          analysis: asText(analysis),
+          news: asText(news),
+          financials: asText(financials),
+        },
+        is_researching: false,
+      });
+    },
+  });
+
   //🪁 Generative UI: https://docs.copilotkit.ai/coagents/generative-ui
   useCopilotAction({
     name: "showCompanyCard",